@@ -1,4 +1,11 @@
+import asyncio
+import json
+import re
+from collections import defaultdict
+from operator import itemgetter
 import requests
+from requests.adapters import HTTPAdapter
+import aiohttp
 from datetime import datetime, timedelta
 from tabulate import tabulate
 import time
@@ -10,6 +17,20 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+# pandas is optional; without it aggregation falls back to pure Python
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# orjson is optional; it parses large Cost Management payloads several times
+# faster than the stdlib json module
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 # Load environment variables
 load_dotenv()
 
@@ -33,7 +54,7 @@ missing_vars = [var for var in required_vars if not os.getenv(var)]
 if missing_vars:
     raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
-# Authenticate with Azure AD and get access token
+# Azure AD token endpoint
 auth_url = f'https://login.microsoftonline.com/{tenant_id}/oauth2/token'
 auth_data = {
     'grant_type': 'client_credentials',
@@ -41,67 +62,117 @@ auth_data = {
     'client_secret': client_secret,
     'resource': 'https://management.azure.com/'
 }
-auth_response = requests.post(auth_url, data=auth_data)
-access_token = auth_response.json()['access_token']
 
-def get_cost_data(subscription_id, date, retry_count=0, max_retries=3):
-    """Get cost data for a specific subscription and date with retry logic"""
-    usage_url = f'https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version=2023-03-01'
-    
-    usage_data = {
-        'type': 'Usage',
-        'timeframe': 'Custom',
-        'timePeriod': {
-            'from': date.strftime('%Y-%m-%dT00:00:00Z'),
-            'to': date.strftime('%Y-%m-%dT23:59:59Z')
-        },
-        'dataset': {
-            'granularity': 'Daily',
-            'aggregation': {
-                'totalCost': {
-                    'name': 'Cost',
-                    'function': 'Sum'
-                }
-            },
-            'grouping': [
-                {
-                    'type': 'Dimension',
-                    'name': 'ResourceType'
-                }
-            ]
-        }
-    }
-    
+# Pooled session for synchronous calls (keep-alive avoids a fresh TLS
+# handshake per request)
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+class TokenProvider:
+    """Acquire the AAD access token on demand and refresh it before expiry"""
+    def __init__(self):
+        self.token = None
+        self.expiry = 0.0
+
+    def get(self):
+        # Refresh silently when less than 60 seconds remain
+        if time.time() > self.expiry - 60:
+            self._refresh()
+        return self.token
+
+    def _refresh(self):
+        response = SESSION.post(auth_url, data=auth_data)
+        response.raise_for_status()
+        payload = _loads(response.content)
+        self.token = payload['access_token']
+        self.expiry = time.time() + int(payload['expires_in'])
+
+token_provider = TokenProvider()
+
+# Daily totals are immutable once Azure finalizes them (~3 days), so cache
+# them on disk and only re-query recent days on subsequent runs
+CACHE_FILE = 'cost_cache.json'
+CACHE_FINAL_AGE_DAYS = 3
+
+def load_cost_cache():
+    """Load the on-disk cost cache, returning an empty cache if absent"""
     try:
-        response = requests.post(
-            usage_url, 
-            headers={'Authorization': f'Bearer {access_token}'}, 
-            json=usage_data
-        )
-        
-        # Handle rate limiting
-        if response.status_code == 429:
-            if retry_count < max_retries:
-                # Get retry-after header or use exponential backoff
-                retry_after = int(response.headers.get('Retry-After', 2 ** retry_count))
-                print(f"Rate limit hit. Waiting {retry_after} seconds before retry...")
-                time.sleep(retry_after)
-                return get_cost_data(subscription_id, date, retry_count + 1, max_retries)
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cost_cache(cache):
+    """Persist the cost cache to disk"""
+    try:
+        with open(CACHE_FILE, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"Warning: could not write cost cache: {str(e)}")
+
+def plan_fetch_spans(cache, num_days):
+    """Split the lookback window into cached days and the span to fetch
+
+    Returns ({sub_name: (fetch_start, end_date)}, {sub_name: {date_key: costs}}).
+    Days older than CACHE_FINAL_AGE_DAYS that are already cached are served
+    from disk; the remaining (always including the most recent days) are
+    fetched from the API.
+    """
+    now = datetime.now()
+    end_date = now - timedelta(days=1)
+    start_date = end_date - timedelta(days=num_days - 1)
+    final_cutoff = now - timedelta(days=CACHE_FINAL_AGE_DAYS)
+
+    spans = {}
+    cached_days = {}
+    for sub_name, subscription_id in subscriptions.items():
+        sub_cache = cache.get(subscription_id, {})
+        cached = {}
+        fetch_start = start_date
+
+        # Consume the leading run of finalized, already-cached days
+        day = start_date
+        while day <= end_date:
+            key = day.strftime('%Y%m%d')
+            if day < final_cutoff and key in sub_cache:
+                cached[int(key)] = sub_cache[key]
+                fetch_start = day + timedelta(days=1)
+                day += timedelta(days=1)
             else:
-                print(f"Max retries reached for {date.strftime('%Y-%m-%d')}")
-                return []
-        
-        response.raise_for_status()
-        return response.json()['properties']['rows']
-    except Exception as e:
-        print(f"Error fetching data for {date.strftime('%Y-%m-%d')}: {str(e)}")
-        return []
+                break
 
-def get_cost_data_range(subscription_id, start_date, end_date):
-    """Get cost data for a date range in a single API call"""
-    usage_url = f'https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version=2023-03-01'
-    
-    usage_data = {
+        spans[sub_name] = (fetch_start, end_date)
+        cached_days[sub_name] = cached
+
+    return spans, cached_days
+
+def update_cost_cache(cache, subscription_id, daily_data):
+    """Merge freshly fetched finalized days into the cache"""
+    final_cutoff = int((datetime.now() - timedelta(days=CACHE_FINAL_AGE_DAYS)).strftime('%Y%m%d'))
+    sub_cache = cache.setdefault(subscription_id, {})
+    for date_key, costs in daily_data.items():
+        if int(date_key) < final_cutoff:
+            sub_cache[str(date_key)] = costs
+
+def build_usage_query(start_date, end_date, group_charge_type=False):
+    """Build the Cost Management query body for a date range
+
+    ChargeType grouping multiplies the number of returned rows but nothing
+    downstream consumes it, so it is only included on request.
+    """
+    grouping = [
+        {
+            'type': 'Dimension',
+            'name': 'ResourceType'
+        }
+    ]
+    if group_charge_type:
+        grouping.append({
+            'type': 'Dimension',
+            'name': 'ChargeType'
+        })
+
+    return {
         'type': 'Usage',
         'timeframe': 'Custom',
         'timePeriod': {
@@ -116,85 +187,139 @@ def get_cost_data_range(subscription_id, start_date, end_date):
                     'function': 'Sum'
                 }
             },
-            'grouping': [
-                {
-                    'type': 'Dimension',
-                    'name': 'ResourceType'
-                },
-                {
-                    'type': 'Dimension',
-                    'name': 'ChargeType'
-                }
-            ]
+            'grouping': grouping
         }
     }
-    
+
+async def _post_with_retry(session, url, body, timeout, max_retries=5):
+    """POST with iterative 429 backoff, returning the parsed response body"""
+    for attempt in range(max_retries):
+        async with session.post(
+            url,
+            headers={'Authorization': f'Bearer {token_provider.get()}'},
+            json=body,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            # Handle rate limiting
+            if response.status == 429:
+                retry_after = int(response.headers.get('Retry-After', 2 ** attempt))
+                print(f"Rate limit hit. Waiting {retry_after} seconds before retry...")
+                await asyncio.sleep(retry_after)
+                continue
+
+            response.raise_for_status()
+            return _loads(await response.read())
+
+    raise RuntimeError(f"Rate limited after {max_retries} attempts: {url}")
+
+async def get_cost_data_range(session, subscription_id, start_date, end_date):
+    """Get cost data for a date range in a single API call"""
+    usage_url = f'https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version=2023-03-01'
+
+    usage_data = build_usage_query(start_date, end_date)
+
     try:
-        response = requests.post(
-            usage_url, 
-            headers={'Authorization': f'Bearer {access_token}'}, 
-            json=usage_data,
-            timeout=30
-        )
-        
-        # Handle rate limiting
-        if response.status_code == 429:
-            retry_after = int(response.headers.get('Retry-After', 60))
-            print(f"Rate limit hit. Waiting {retry_after} seconds...")
-            time.sleep(retry_after)
-            return get_cost_data_range(subscription_id, start_date, end_date)
-        
-        response.raise_for_status()
-        return response.json()['properties']
+        payload = await _post_with_retry(session, usage_url, usage_data, timeout=30)
+        return payload['properties']
     except Exception as e:
         print(f"Error fetching data range: {str(e)}")
         return None
 
-def process_cost_data(raw_data):
-    """Process raw cost data into categories based on Resource Type"""
-    costs = {
-        'Databricks': 0,
-        'Virtual Machine': 0,
-        'Storage': 0,
-        'Others': 0
+async def get_cost_data_batch(session, spans):
+    """Get cost data for all subscriptions in a single $batch API call
+
+    spans maps sub_name -> (start_date, end_date), allowing each
+    subscription to fetch only the days its cache does not cover.
+    """
+    batch_url = 'https://management.azure.com/batch?api-version=2020-06-01'
+
+    batch_body = {
+        'requests': [
+            {
+                'name': sub_name,
+                'httpMethod': 'POST',
+                'url': f'/subscriptions/{subscriptions[sub_name]}/providers/Microsoft.CostManagement/query?api-version=2023-03-01',
+                'content': build_usage_query(*spans[sub_name])
+            }
+            for sub_name in subscriptions
+        ]
     }
-    
-    for row in raw_data:
-        cost = row[0]
-        resource_type = row[2].lower() if len(row) > 2 else ''
-        
-        # Categorize based on resource type
-        if 'databricks/workspaces' in resource_type or 'databricks/workspace' in resource_type:
-            costs['Databricks'] += cost
-        elif 'compute/virtualmachines' in resource_type or 'microsoft.compute/virtualmachines' in resource_type:
-            costs['Virtual Machine'] += cost
-        elif 'storage/storageaccounts' in resource_type or 'microsoft.storage/storageaccounts' in resource_type:
-            costs['Storage'] += cost
+
+    try:
+        batch_response = await _post_with_retry(session, batch_url, batch_body, timeout=60)
+    except Exception as e:
+        print(f"Error fetching batch data: {str(e)}")
+        return None
+
+    # Correlate inner responses back to subscriptions by name
+    responses = {sub_name: None for sub_name in subscriptions}
+    for inner in batch_response.get('responses', []):
+        sub_name = inner.get('name')
+        if inner.get('httpStatusCode') == 200:
+            responses[sub_name] = inner['content']['properties']
         else:
-            costs['Others'] += cost
-    
-    return costs
+            print(f"Batch sub-request for {sub_name} failed with status {inner.get('httpStatusCode')}")
+
+    return responses
+
+# Cost categories in report order
+COST_CATEGORIES = ['Databricks', 'Virtual Machine', 'Storage', 'Others']
+
+# Default returned for days with no usage rows
+_ZERO_COSTS = {category: 0.0 for category in COST_CATEGORIES}
+
+# Precompiled resource-type classifier: one regex search per row instead of
+# chained substring tests and a .lower() copy per test
+_CAT_RE = re.compile(r'(databricks/workspace|compute/virtualmachines|storage/storageaccounts)', re.IGNORECASE)
+_CAT_MAP = {
+    'databricks/workspace': 'Databricks',
+    'compute/virtualmachines': 'Virtual Machine',
+    'storage/storageaccounts': 'Storage'
+}
 
-def parse_range_response(response_data, num_days):
-    """Parse the range API response and organize by date"""
+def classify_resource_type(resource_type):
+    """Map a ResourceType string to a cost category"""
+    match = _CAT_RE.search(resource_type)
+    return _CAT_MAP[match.group(1).lower()] if match else 'Others'
+
+def aggregate_daily_costs(response_data):
+    """Aggregate a range response into {date_key: {category: cost}}"""
     if not response_data or 'rows' not in response_data:
         return {}
-    
-    # Get column indices
-    columns = response_data.get('columns', [])
-    cost_idx = next((i for i, col in enumerate(columns) if col['name'] == 'Cost'), 0)
-    date_idx = next((i for i, col in enumerate(columns) if col['name'] == 'UsageDate'), 1)
-    resource_idx = next((i for i, col in enumerate(columns) if col['name'] == 'ResourceType'), 2)
-    
-    # Organize data by date
-    daily_data = {}
-    for row in response_data['rows']:
-        date = row[date_idx]
-        if date not in daily_data:
-            daily_data[date] = []
-        daily_data[date].append(row)
-    
-    return daily_data
+
+    if pd is None:
+        # Pure-Python fallback: classify and accumulate in a single pass
+        columns = response_data.get('columns', [])
+        cost_idx = next((i for i, col in enumerate(columns) if col['name'] == 'Cost'), 0)
+        date_idx = next((i for i, col in enumerate(columns) if col['name'] == 'UsageDate'), 1)
+        resource_idx = next((i for i, col in enumerate(columns) if col['name'] == 'ResourceType'), 2)
+
+        # Bind loop machinery to locals; itemgetter unpacks each row in one
+        # C-level call instead of three index expressions
+        pick = itemgetter(date_idx, cost_idx, resource_idx)
+        classify = classify_resource_type
+        daily = defaultdict(lambda: dict(_ZERO_COSTS))
+        for row in response_data['rows']:
+            date, cost, resource_type = pick(row)
+            daily[date][classify(resource_type)] += cost
+        return dict(daily)
+
+    # Vectorized path: classify every row at once and pivot to per-day sums
+    df = pd.DataFrame(
+        response_data['rows'],
+        columns=[col['name'] for col in response_data.get('columns', [])]
+    )
+    category = (
+        df['ResourceType'].str.extract(_CAT_RE, expand=False)
+        .str.lower().map(_CAT_MAP).fillna('Others')
+    )
+    pivot = (
+        df.assign(category=category)
+        .groupby(['UsageDate', 'category'])['Cost'].sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=COST_CATEGORIES, fill_value=0.0)
+    )
+    return {int(date): row.to_dict() for date, row in pivot.iterrows()}
 
 def set_cell_border(cell, **kwargs):
     """Set cell borders"""
@@ -218,69 +343,62 @@ def add_table_to_doc(doc, table_data, headers, title=None):
         run.bold = True
         run.font.size = Pt(11)
     
-    # Create table
-    table = doc.add_table(rows=1, cols=len(headers))
+    # Create table with every row preallocated; add_row walks the XML tree
+    # of all existing rows, so appending one row at a time is O(n^2)
+    table = doc.add_table(rows=1 + len(table_data), cols=len(headers))
     table.style = 'Light Grid Accent 1'
-    
+
     # Add headers
     hdr_cells = table.rows[0].cells
     for i, header in enumerate(headers):
         hdr_cells[i].text = header
         hdr_cells[i].paragraphs[0].runs[0].font.bold = True
         hdr_cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Add data rows
-    for row_data in table_data:
-        row_cells = table.add_row().cells
-        for i, cell_data in enumerate(row_data):
-            row_cells[i].text = str(cell_data)
-            row_cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Fill data rows
+    for row, row_data in zip(table.rows[1:], table_data):
+        for cell, cell_data in zip(row.cells, row_data):
+            cell.text = str(cell_data)
+            cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     doc.add_paragraph()  # Add spacing
 
-def generate_data_for_subscription(subscription_id, subscription_name, num_days):
-    """Generate cost data for a subscription and return it"""
-    print(f"\nFetching data for {subscription_name.upper()} subscription...")
-    
-    # Calculate date range
-    end_date = datetime.now() - timedelta(days=1)
-    start_date = end_date - timedelta(days=num_days - 1)
-    
-    # Get all data in one API call
-    response_data = get_cost_data_range(subscription_id, start_date, end_date)
-    
-    if not response_data:
-        print(f"Failed to fetch data for {subscription_name} subscription.\n")
-        return None, None
-    
-    daily_data = parse_range_response(response_data, num_days)
-    
-    # Prepare table data
-    cost_table_data = []
-    percent_table_data = []
-    all_costs = []
-    date_strings = []
-    
-    # Process each day
-    for i in range(num_days - 1, -1, -1):
-        date = datetime.now() - timedelta(days=i+1)
-        date_key = int(date.strftime('%Y%m%d'))
-        date_str = date.strftime('%m/%d')
-        date_strings.append(date_str)
-        
-        # Get data for this date
-        day_rows = daily_data.get(date_key, [])
-        costs = process_cost_data(day_rows)
-        all_costs.append(costs)
-    
+def report_days(num_days):
+    """Precompute (int_key, short_label) for each report day, oldest first"""
+    now = datetime.now()
+    days = [now - timedelta(days=i + 1) for i in range(num_days - 1, -1, -1)]
+    return [(int(day.strftime('%Y%m%d')), day.strftime('%m/%d')) for day in days]
+
+def compute_subscription_series(daily_data, subscription_name, num_days):
+    """Compute the per-day cost series shared by the console and Word paths"""
+    days = report_days(num_days)
+    date_strings = [date_str for _, date_str in days]
+    all_costs = [daily_data.get(date_key, _ZERO_COSTS) for date_key, _ in days]
+
     # Determine which categories have data (skip Databricks for main)
-    categories = ['Databricks', 'Virtual Machine', 'Storage', 'Others']
+    categories = list(COST_CATEGORIES)
     if subscription_name.lower() == 'main':
         # Check if main has any Databricks costs
         has_databricks = any(costs['Databricks'] > 0 for costs in all_costs)
         if not has_databricks:
             categories = ['Virtual Machine', 'Storage', 'Others']
-    
+
+    return date_strings, all_costs, categories
+
+def build_doc_data(daily_data, subscription_name, num_days):
+    """Build table data for a subscription's report tables"""
+    if daily_data is None:
+        print(f"Failed to fetch data for {subscription_name} subscription.\n")
+        return None
+
+    date_strings, all_costs, categories = compute_subscription_series(
+        daily_data, subscription_name, num_days
+    )
+
+    # Prepare table data
+    cost_table_data = []
+    percent_table_data = []
+
     # Build cost table
     for i, costs in enumerate(all_costs):
         row = [date_strings[i]]
@@ -369,88 +487,102 @@ def create_word_document(all_data, num_days):
     
     return filename
 
-def generate_table_for_subscription(subscription_id, subscription_name, num_days):
-    """Generate cost table for a subscription (console output)"""
+def render_console(doc_data, subscription_name):
+    """Print a subscription's cost tables to the console
+
+    Consumes the same pre-built tables as the Word document, so the
+    classification and formatting passes run only once per subscription.
+    """
     print(f"\n{'='*80}")
     print(f"{subscription_name.upper()} SUBSCRIPTION")
     print(f"{'='*80}\n")
-    
-    # Calculate date range
-    end_date = datetime.now() - timedelta(days=1)
-    start_date = end_date - timedelta(days=num_days - 1)
-    
-    print(f"Fetching data from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}...")
-    
-    # Get all data in one API call
-    response_data = get_cost_data_range(subscription_id, start_date, end_date)
-    
-    if not response_data:
+
+    if doc_data is None:
         print("Failed to fetch data for this subscription.\n")
         return
-    
-    daily_data = parse_range_response(response_data, num_days)
-    
-    # Prepare table data
-    table_data = []
-    all_costs = []
-    
-    # Process each day
-    for i in range(num_days - 1, -1, -1):
-        date = datetime.now() - timedelta(days=i+1)
-        date_key = int(date.strftime('%Y%m%d'))
-        
-        # Get data for this date
-        day_rows = daily_data.get(date_key, [])
-        costs = process_cost_data(day_rows)
-        all_costs.append(costs)
-        
-        # Create row
-        row = [
-            date.strftime('%m/%d'),
-            f"${costs['Databricks']:.2f}",
-            f"${costs['Virtual Machine']:.2f}",
-            f"${costs['Storage']:.2f}",
-            f"${costs['Others']:.2f}"
-        ]
-        
-        table_data.append(row)
-    
-    # Define headers
-    headers = ['Date', 'Databricks', 'Virtual Machine', 'Storage', 'Others']
-    categories = ['Databricks', 'Virtual Machine', 'Storage', 'Others']
-    
-    # Print cost table
+
+    # disable_numparse skips tabulate's float() probe on every cell; the
+    # values are pre-formatted strings anyway
     print("Cost Table:")
-    print(tabulate(table_data, headers=headers, tablefmt='grid'))
+    print(tabulate(doc_data['cost_table'], headers=doc_data['headers'],
+                   tablefmt='simple', disable_numparse=True))
     print()
-    
-    # Calculate and print percentage change table
+
     print("Percentage Change (Day over Day):")
-    percent_table_data = []
-    
-    for i in range(1, len(all_costs)):
-        date = (datetime.now() - timedelta(days=len(all_costs)-i)).strftime('%m/%d')
-        row = [date]
-        
-        for category in categories:
-            prev_cost = all_costs[i-1][category]
-            curr_cost = all_costs[i][category]
-            
-            if prev_cost == 0:
-                if curr_cost == 0:
-                    percent_change = 0
-                else:
-                    percent_change = 100
-            else:
-                percent_change = ((curr_cost - prev_cost) / prev_cost) * 100
-            
-            row.append(f"{percent_change:+.2f}%")
-        
-        percent_table_data.append(row)
-    
-    print(tabulate(percent_table_data, headers=headers, tablefmt='grid'))
+    print(tabulate(doc_data['percent_table'], headers=doc_data['headers'],
+                   tablefmt='simple', disable_numparse=True))
     print()
 
+async def fetch_all_subscriptions(spans):
+    """Fetch cost data for all subscriptions concurrently"""
+    for sub_name, (start_date, end_date) in spans.items():
+        print(f"Fetching {sub_name} data from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}...")
+
+    # Limit concurrent requests to avoid rate limiting
+    semaphore = asyncio.Semaphore(4)
+
+    async def fetch_one(sub_name):
+        start_date, end_date = spans[sub_name]
+        async with semaphore:
+            return await get_cost_data_range(session, subscriptions[sub_name], start_date, end_date)
+
+    # Pooled connector so retries and future calls reuse warm TLS connections
+    connector = aiohttp.TCPConnector(limit=16)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # One $batch call counts as a single request against the rate limit
+        responses = await get_cost_data_batch(session, spans)
+        if responses is not None:
+            return responses
+
+        # Fall back to per-subscription queries if the batch call failed
+        print("Batch request failed, falling back to per-subscription queries...")
+        sub_names = list(subscriptions.keys())
+        results = await asyncio.gather(
+            *(fetch_one(sub_name) for sub_name in sub_names),
+            return_exceptions=True
+        )
+
+    responses = {}
+    for sub_name, result in zip(sub_names, results):
+        if isinstance(result, Exception):
+            print(f"Error fetching data for {sub_name}: {str(result)}")
+            responses[sub_name] = None
+        else:
+            responses[sub_name] = result
+
+    return responses
+
+def prepare_subscription_data(sub_name, response_data, cached_days, num_days):
+    """Aggregate a response and build its Word table data (CPU-bound)"""
+    daily_data = aggregate_daily_costs(response_data) if response_data else None
+
+    # Compose the full window from cache + fresh data
+    if daily_data is not None:
+        daily_data.update(cached_days)
+
+    doc_data = build_doc_data(daily_data, sub_name, num_days)
+    return daily_data, doc_data
+
+async def fetch_and_prepare_all(spans, cached_days, num_days):
+    """Fetch all subscriptions and build their report data off-thread
+
+    Aggregation and Word table construction are CPU-bound, so they run in
+    worker threads as each subscription's response becomes available
+    instead of serially after all fetching completes.
+    """
+    responses = await fetch_all_subscriptions(spans)
+
+    prepared = await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                prepare_subscription_data,
+                sub_name, responses[sub_name], cached_days[sub_name], num_days
+            )
+            for sub_name in subscriptions
+        )
+    )
+    return dict(zip(subscriptions, prepared))
+
 if __name__ == "__main__":
     # Get user input for number of days
     while True:
@@ -473,23 +605,31 @@ if __name__ == "__main__":
     print(f"AZURE COST REPORT - LAST {num_days} DAYS (ending yesterday)")
     print("="*80)
 
+    # Serve finalized days from the disk cache and only fetch the rest
+    cache = load_cost_cache()
+    spans, cached_days = plan_fetch_spans(cache, num_days)
+
+    # Fetch all subscriptions concurrently and build report data off-thread
+    prepared = asyncio.run(fetch_and_prepare_all(spans, cached_days, num_days))
+
     # Collect data for Word document
     all_data = {}
-    
-    # Process subscriptions with delay between them
-    for idx, sub_name in enumerate(['main', 'prod', 'dev', 'test']):
-        # Generate console output
-        generate_table_for_subscription(subscriptions[sub_name], sub_name.upper(), num_days)
-        
+
+    for sub_name in ['main', 'prod', 'dev', 'test']:
+        daily_data, doc_data = prepared[sub_name]
+
+        # Persist the newly finalized days
+        if daily_data is not None:
+            update_cost_cache(cache, subscriptions[sub_name], daily_data)
+
+        # Generate console output from the shared tables
+        render_console(doc_data, sub_name)
+
         # Collect data for Word document
-        data = generate_data_for_subscription(subscriptions[sub_name], sub_name, num_days)
-        if data:
-            all_data[sub_name] = data
-        
-        # Add delay between subscriptions to avoid rate limiting (except for the last one)
-        if idx < 3:
-            print("Waiting 2 seconds before next subscription...")
-            time.sleep(2)
+        if doc_data:
+            all_data[sub_name] = doc_data
+
+    save_cost_cache(cache)
 
     print("="*80)
     print("Console report generation completed!")